@@ -5,8 +5,17 @@ with app.app_context():
     try:
         # Try to add the column
         with db.engine.connect() as conn:
-            conn.execute(text("ALTER TABLE user ADD COLUMN precision_rebalancing BOOLEAN DEFAULT 1"))
-            conn.commit()
+            # Relax durability for the migration only: DDL then commits
+            # with a single fsync instead of one per statement. Restored
+            # to the app's normal setting before the connection is reused.
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+            conn.execute(text("PRAGMA synchronous=OFF"))
+            conn.execute(text("PRAGMA temp_store=MEMORY"))
+            try:
+                conn.execute(text("ALTER TABLE user ADD COLUMN precision_rebalancing BOOLEAN DEFAULT 1"))
+                conn.commit()
+            finally:
+                conn.execute(text("PRAGMA synchronous=NORMAL"))
         print("✓ Added precision_rebalancing column")
     except Exception as e:
         if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
@@ -1,11 +1,19 @@
 import os
+import hashlib
 import logging
-from flask import Flask, render_template, redirect, url_for, request, jsonify, flash
+import sqlite3
+import threading
+import time
+import orjson
+from flask import Flask, render_template, redirect, url_for, request, flash, Response, g
 from flask_login import LoginManager, login_required, current_user
+from flask_compress import Compress
 from extensions import db
 from datetime import datetime
-from collections import defaultdict
-from sqlalchemy import inspect
+from collections import defaultdict, namedtuple
+from sqlalchemy import event, func, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import selectinload
 
 log = logging.getLogger(__name__)
 
@@ -21,21 +29,72 @@ if not _secret:
 app.config['SECRET_KEY'] = _secret
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///data/portfolio.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Pool connections instead of opening a fresh one per request; hot routes
+# (dashboard/rebalance) issue several queries each.  JSON columns
+# (preference account_config) go through orjson's C parser instead of
+# stdlib json.
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 20,
+        'max_overflow': 10,
+        'pool_pre_ping': True,
+        'pool_recycle': 300,
+        'connect_args': {'application_name': 'portfolio-rebalancer'},
+        'json_serializer': lambda obj: orjson.dumps(obj).decode(),
+        'json_deserializer': orjson.loads,
+    }
+else:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 10,
+        'pool_pre_ping': True,
+        'pool_recycle': 300,
+        # Pooled connections live across requests, so a bigger sqlite3
+        # statement cache lets hot queries skip re-preparing their SQL.
+        'connect_args': {'cached_statements': 256},
+        'json_serializer': lambda obj: orjson.dumps(obj).decode(),
+        'json_deserializer': orjson.loads,
+    }
 app.config['SESSION_COOKIE_SECURE'] = os.getenv('FLASK_ENV') == 'production'
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
+# Large JSON/HTML responses are bandwidth-bound for remote clients;
+# brotli/gzip at these settings compresses repetitive JSON 8-15x for
+# negligible CPU.
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 1024
+app.config['COMPRESS_LEVEL'] = 4
+
 db.init_app(app)
+Compress(app)
+
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune SQLite for web-app use: WAL avoids writer/reader blocking and
+    synchronous=NORMAL drops the per-commit fsync (safe under WAL)."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.execute('PRAGMA cache_size=-64000')
+    cursor.close()
 
 from models import User, Account, Holding, Security, SecurityPreference
 from models import Target, AssetClass, ExchangeRate, RebalanceTransaction
 from auth import auth_bp, init_oauth
-from services.fx import get_exchange_rates
+from services.fx import get_exchange_rates, invalidate_rate_memo
 from services.portfolio import (
+    account_totals_in_base,
     calculate_portfolio_allocation,
     calculate_asset_class_deltas,
 )
-from services.prices import fetch_prices_from_user_sheet
+from services.prices import peek_cached_prices
+from services import jobs
 from rebalancer import generate_rebalance_transactions
 
 for handler in logging.root.handlers[:]:
@@ -61,6 +120,53 @@ def load_user(user_id):
 
 init_oauth(app)
 app.register_blueprint(auth_bp, url_prefix='/auth')
+jobs.init_app(app)
+
+@app.before_request
+def _preload_accounts():
+    """Load the user's accounts (with holdings and securities) once per
+    request into g.accounts instead of re-querying in every route."""
+    if current_user.is_authenticated:
+        g.accounts = (
+            Account.query
+            .options(selectinload(Account.holdings).selectinload(Holding.security))
+            .filter_by(user_id=current_user.id)
+            .all()
+        )
+
+
+# ---------------------------------------------------------------------------
+# Asset-class snapshot
+# ---------------------------------------------------------------------------
+# The asset-class list is tiny, name-ordered in six routes, and changes
+# rarely, so GETs are served from an in-memory snapshot invalidated on
+# write.  The write-side invalidation only reaches the worker that
+# handled the POST (gunicorn runs 2 workers), so a short TTL bounds how
+# long the other workers can serve a stale list.  Templates only need
+# id/name.
+AssetClassRow = namedtuple('AssetClassRow', ['id', 'name'])
+_ASSET_CLASS_TTL_SECONDS = 30
+_asset_class_snap = {'rows': None, 'expires_at': 0.0}
+_asset_class_lock = threading.Lock()
+
+
+def get_asset_classes():
+    with _asset_class_lock:
+        rows = _asset_class_snap['rows']
+        if rows is None or _asset_class_snap['expires_at'] < time.time():
+            rows = [
+                AssetClassRow(ac.id, ac.name)
+                for ac in AssetClass.query.order_by(AssetClass.name.asc()).all()
+            ]
+            _asset_class_snap['rows'] = rows
+            _asset_class_snap['expires_at'] = time.time() + _ASSET_CLASS_TTL_SECONDS
+        return rows
+
+
+def invalidate_asset_classes():
+    with _asset_class_lock:
+        _asset_class_snap['rows'] = None
+
 
 # ---------------------------------------------------------------------------
 # Routes – General
@@ -75,7 +181,7 @@ def index():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    accounts = Account.query.filter_by(user_id=current_user.id).all()
+    accounts = g.accounts
     targets = Target.query.filter_by(user_id=current_user.id).all()
     exchange_rates = get_exchange_rates(current_user)
     allocation, allocation_pct, total_value = calculate_portfolio_allocation(
@@ -85,6 +191,7 @@ def dashboard():
         'dashboard.html',
         user=current_user,
         accounts=accounts,
+        account_totals=account_totals_in_base(current_user, exchange_rates),
         targets=targets,
         total_value=total_value,
         allocation=allocation,
@@ -100,7 +207,7 @@ def dashboard():
 @app.route('/accounts')
 @login_required
 def accounts():
-    user_accounts = Account.query.filter_by(user_id=current_user.id).all()
+    user_accounts = g.accounts
     return render_template('accounts.html', accounts=user_accounts)
 
 
@@ -158,7 +265,7 @@ def update_cash_balance(account_id):
 @app.route('/holdings')
 @login_required
 def holdings():
-    accounts = Account.query.filter_by(user_id=current_user.id).all()
+    accounts = g.accounts
     exchange_rates = get_exchange_rates(current_user)
     all_holdings = (
         db.session.query(Holding)
@@ -174,7 +281,7 @@ def holdings():
         accounts=accounts,
         exchange_rates=exchange_rates,
         base_currency=current_user.base_currency,
-        asset_classes=AssetClass.query.order_by(AssetClass.name.asc()).all(),
+        asset_classes=get_asset_classes(),
         securities=Security.query.order_by(Security.ticker.asc()).all(),
     )
 
@@ -194,11 +301,18 @@ def add_holding():
         flash('Unauthorized access', 'error')
         return redirect(url_for('holdings'))
     security = Security.query.get_or_404(security_id)
+    price_val = float(price) if price else 0.0
+    if not price_val:
+        # Fall back to an already-cached sheet price so a blank price
+        # field doesn't create a $0 holding when we have a better value.
+        # Never fetch here — a cold cache would block the POST for
+        # seconds; the background refresh fills the price soon anyway.
+        price_val = peek_cached_prices(current_user).get(security.ticker, 0.0)
     holding = Holding(
         account_id=account_id,
         security_id=security_id,
         quantity=float(quantity),
-        price=float(price) if price else 0.0,
+        price=price_val,
     )
     db.session.add(holding)
     db.session.commit()
@@ -225,9 +339,9 @@ def edit_holding(holding_id):
     return render_template(
         'edit_holding.html',
         holding=holding,
-        accounts=Account.query.filter_by(user_id=current_user.id).all(),
+        accounts=g.accounts,
         securities=Security.query.all(),
-        asset_classes=AssetClass.query.order_by(AssetClass.name.asc()).all(),
+        asset_classes=get_asset_classes(),
     )
 
 
@@ -248,34 +362,10 @@ def delete_holding(holding_id):
 @app.route('/update_prices', methods=['POST'])
 @login_required
 def update_prices():
-    try:
-        prices = fetch_prices_from_user_sheet(current_user)
-        if not prices:
-            flash('No prices fetched from Google Sheet.', 'warning')
-            return redirect(url_for('holdings'))
-        all_holdings = (
-            Holding.query
-            .join(Account)
-            .join(Security)
-            .filter(
-                Account.user_id == current_user.id,
-                Security.is_public == True,
-                Security.auto_update_price == True,
-            )
-            .all()
-        )
-        updated = 0
-        for h in all_holdings:
-            price = prices.get(h.security.ticker)
-            if price is not None:
-                h.price = float(price)
-                h.updated_at = datetime.utcnow()
-                updated += 1
-        db.session.commit()
-        flash(f'Successfully updated {updated} security prices!', 'success')
-    except Exception as exc:
-        log.exception('Error updating prices')
-        flash(f'Error updating prices: {exc}', 'danger')
+    # The sheet fetch can take tens of seconds; run it off the request
+    # thread and let the page pick up the new prices on the next load.
+    jobs.submit_price_refresh(current_user.id)
+    flash('Price refresh queued; values will update shortly.', 'info')
     return redirect(url_for('holdings'))
 
 
@@ -288,8 +378,8 @@ def targets():
     return render_template(
         'targets.html',
         targets=Target.query.filter_by(user_id=current_user.id).all(),
-        accounts=Account.query.filter_by(user_id=current_user.id).all(),
-        asset_classes=AssetClass.query.order_by(AssetClass.name.asc()).all(),
+        accounts=g.accounts,
+        asset_classes=get_asset_classes(),
     )
 
 
@@ -308,6 +398,7 @@ def update_targets():
             db.session.add(ac)
             db.session.flush()
             asset_class_id = ac.id
+            invalidate_asset_classes()
         db.session.add(Target(
             user_id=current_user.id,
             asset_class_id=asset_class_id,
@@ -352,13 +443,13 @@ def securities():
         'securities.html',
         securities=all_securities,
         preferences={p.security_id: p for p in prefs},
-        accounts=Account.query.filter_by(user_id=current_user.id).all(),
+        accounts=g.accounts,
         restriction_types=[
             ('unrestricted', 'Unrestricted - Can be held in any account'),
             ('restricted_to_accounts', 'Restricted - Only specific accounts allowed'),
             ('prioritized_accounts', 'Prioritized - Prefer certain accounts over others'),
         ],
-        asset_classes=AssetClass.query.order_by(AssetClass.name.asc()).all(),
+        asset_classes=get_asset_classes(),
     )
 
 
@@ -386,7 +477,7 @@ def add_security():
             return redirect(url_for('securities'))
     return render_template(
         'add_security.html',
-        asset_classes=AssetClass.query.order_by(AssetClass.name.asc()).all(),
+        asset_classes=get_asset_classes(),
     )
 
 
@@ -407,7 +498,7 @@ def edit_security(security_id):
     return render_template(
         'edit_security.html',
         security=security,
-        asset_classes=AssetClass.query.order_by(AssetClass.name.asc()).all(),
+        asset_classes=get_asset_classes(),
     )
 
 
@@ -415,9 +506,14 @@ def edit_security(security_id):
 @login_required
 def delete_security(security_id):
     s = Security.query.get_or_404(security_id)
+    ticker = s.ticker
+    # Bulk-delete dependents so the ORM cascade doesn't load and delete
+    # holdings/preferences row by row; one statement each, one commit.
+    Holding.query.filter_by(security_id=security_id).delete(synchronize_session=False)
+    SecurityPreference.query.filter_by(security_id=security_id).delete(synchronize_session=False)
     db.session.delete(s)
     db.session.commit()
-    flash(f'Deleted {s.ticker}.', 'success')
+    flash(f'Deleted {ticker}.', 'success')
     return redirect(url_for('securities'))
 
 
@@ -509,7 +605,7 @@ def rebalance():
         comparison_data=comparison_data,
         total_portfolio=total_portfolio,
         base_currency=current_user.base_currency,
-        accounts=current_user.accounts,
+        accounts=g.accounts,
         balanced_threshold=current_user.balanced_threshold,
     )
 
@@ -523,7 +619,7 @@ def rebalance_details(asset_class_id):
         p.security_id: p
         for p in SecurityPreference.query.filter_by(user_id=current_user.id).all()
     }
-    user_accounts = Account.query.filter_by(user_id=current_user.id).all()
+    user_accounts = g.accounts
     security_restrictions = []
     for security in all_securities:
         pref = prefs.get(security.id)
@@ -676,13 +772,8 @@ def exchange_rates_view():
 @app.route('/exchange-rates/update', methods=['POST'])
 @login_required
 def update_exchange_rates():
-    from services.fx import fetch_exchange_rate
-    currencies = ['CAD', 'USD']
-    updated = sum(
-        1 for f in currencies for t in currencies
-        if f != t and fetch_exchange_rate(f, t)
-    )
-    flash(f'Updated {updated} exchange rates', 'success')
+    jobs.submit_fx_refresh()
+    flash('Exchange rate refresh queued; rates will update shortly.', 'info')
     return redirect(url_for('exchange_rates_view'))
 
 
@@ -702,6 +793,7 @@ def add_exchange_rate():
         source='manual',
     ))
     db.session.commit()
+    invalidate_rate_memo()
     flash('Exchange rate added successfully', 'success')
     return redirect(url_for('exchange_rates_view'))
 
@@ -709,44 +801,130 @@ def add_exchange_rate():
 # ---------------------------------------------------------------------------
 # API
 # ---------------------------------------------------------------------------
+def ojsonify(obj) -> Response:
+    """jsonify replacement using orjson's C serializer for the hot /api paths."""
+    return Response(
+        orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+        mimetype='application/json',
+    )
+
+
+def _portfolio_etag() -> str:
+    """Cheap change marker for the user's portfolio: latest holding or
+    account update drives conditional GETs from polling dashboards.
+    Row counts and max ids are included so deletions (which can only
+    lower max(updated_at)) still produce a fresh ETag, and the newest
+    exchange-rate date so FX refreshes invalidate the base-currency
+    values in the payloads."""
+    holding_marker = (
+        db.session.query(
+            func.max(Holding.updated_at),
+            func.max(Holding.id),
+            func.count(Holding.id),
+        )
+        .join(Account)
+        .filter(Account.user_id == current_user.id)
+        .first()
+    )
+    account_marker = (
+        db.session.query(
+            func.max(Account.updated_at),
+            func.max(Account.id),
+            func.count(Account.id),
+        )
+        .filter(Account.user_id == current_user.id)
+        .first()
+    )
+    rate_marker = db.session.query(func.max(ExchangeRate.date)).scalar()
+    return hashlib.md5(
+        f'{current_user.id}:{holding_marker}:{account_marker}:{rate_marker}'.encode()
+    ).hexdigest()
+
+
+def _cached_api_response(data, etag: str) -> Response:
+    resp = ojsonify(data)
+    resp.set_etag(etag)
+    resp.cache_control.private = True
+    resp.cache_control.max_age = 30
+    return resp
+
+
 @app.route('/api/holdings', methods=['GET'])
 @login_required
 def api_get_holdings():
-    accounts = Account.query.filter_by(user_id=current_user.id).all()
+    etag = _portfolio_etag()
+    if request.if_none_match and etag in request.if_none_match:
+        return '', 304
+    # Optional server-side pagination for large portfolios; the default
+    # limit keeps existing clients (which expect everything) working.
+    try:
+        limit = int(request.args.get('limit', 10000))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        limit, offset = 10000, 0
     exchange_rates = get_exchange_rates(current_user)
-    return jsonify([
-        {
-            'account': account.name,
-            'account_type': account.account_type,
-            'ticker': h.security.ticker,
-            'name': h.security.name,   
-            'quantity': h.quantity,
-            'price': h.price,
-            'currency': h.security.currency,  
-            'value': h.market_value,
-            'value_base_currency': h.market_value_in_base_currency(exchange_rates),
-            'asset_class': h.security.asset_class.name, 
-            'is_public': h.security.is_public,
-        }
-        for account in accounts
-        for h in account.holdings
-    ])
+    base = current_user.base_currency
+    # Single projection query: skips ORM instance hydration and the lazy
+    # loads behind holding.security / security.asset_class.
+    rows = (
+        db.session.query(
+            Account.name.label('account'),
+            Account.account_type,
+            Security.ticker,
+            Security.name.label('security_name'),
+            Holding.quantity,
+            Holding.price,
+            Security.currency,
+            AssetClass.name.label('asset_class'),
+            Security.is_public,
+        )
+        .select_from(Holding)
+        .join(Account)
+        .join(Security)
+        .join(AssetClass, Security.asset_class_id == AssetClass.id)
+        .filter(Account.user_id == current_user.id)
+        .order_by(Account.name.asc(), Security.ticker.asc())
+        .limit(limit)
+        .offset(offset)
+        .all()
+    )
+    data = []
+    for r in rows:
+        value = r.quantity * r.price
+        rate = 1.0 if r.currency == base else exchange_rates.get((r.currency, base), 1.0)
+        data.append({
+            'account': r.account,
+            'account_type': r.account_type,
+            'ticker': r.ticker,
+            'name': r.security_name,
+            'quantity': r.quantity,
+            'price': r.price,
+            'currency': r.currency,
+            'value': value,
+            'value_base_currency': value * rate,
+            'asset_class': r.asset_class,
+            'is_public': r.is_public,
+        })
+    return _cached_api_response(data, etag)
 
 
 @app.route('/api/portfolio/summary', methods=['GET'])
 @login_required
 def api_portfolio_summary():
+    etag = _portfolio_etag()
+    if request.if_none_match and etag in request.if_none_match:
+        return '', 304
     exchange_rates = get_exchange_rates(current_user)
     allocation, allocation_pct, total_value = calculate_portfolio_allocation(
         current_user, exchange_rates
     )
-    return jsonify({
+    return _cached_api_response({
         'total_value': total_value,
         'base_currency': current_user.base_currency,
-        'num_accounts': len(current_user.accounts),
+        'num_accounts': len(g.accounts),
         'asset_allocation': dict(allocation),
         'asset_allocation_pct': dict(allocation_pct),
-    })
+    }, etag)
 
 
 # ---------------------------------------------------------------------------
@@ -769,14 +947,43 @@ def forbidden(error):
 # ---------------------------------------------------------------------------
 # Startup
 # ---------------------------------------------------------------------------
-def _init_db():
-    with app.app_context():
+def ensure_schema():
+    """Create any missing tables and indexes, skipping DDL on warm starts.
+
+    create_all() emits a CREATE TABLE IF NOT EXISTS per model, and each
+    one parses SQL and takes a schema lock even when the table exists.
+    One catalog read up front lets warm boots skip all of that.  Indexes
+    declared after a table already shipped are not covered by
+    create_all(), so any declared-but-missing index is created here —
+    idempotent, and a no-op once the catalog is up to date.
+    """
+    inspector = inspect(db.engine)
+    existing = set(inspector.get_table_names())
+    missing = [t for t in db.metadata.tables if t not in existing]
+    if missing:
         db.create_all()
-        log.info('Database schema ensured.')
+        log.info('Created missing tables: %s', ', '.join(sorted(missing)))
+    for name, table in db.metadata.tables.items():
+        if name in missing:
+            continue  # just created with all its indexes
+        have = {ix['name'] for ix in inspector.get_indexes(name)}
+        for index in table.indexes:
+            if index.name not in have:
+                index.create(db.engine)
+                log.info('Created missing index %s on %s', index.name, name)
+
 
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database schema (run once at deploy, not per worker)."""
+    ensure_schema()
+    log.info('Database schema ensured.')
 
-_init_db()
 
 if __name__ == '__main__':
+    # Dev convenience only; production runs `flask init-db` once at deploy
+    # so gunicorn workers don't each hit the DB on import.
+    with app.app_context():
+        ensure_schema()
     app.run(debug=os.getenv('FLASK_ENV') != 'production', host='0.0.0.0', port=5000)
 
@@ -1,8 +1,9 @@
 import os
-import json
+import orjson
 from flask import Blueprint, redirect, url_for, session, flash, request
 from flask_login import login_user, logout_user, current_user
 from authlib.integrations.flask_client import OAuth
+from sqlalchemy import text
 from models import db, User
 from datetime import datetime
 
@@ -55,30 +56,42 @@ def callback():
         google_id = user_info.get('sub')
         email = user_info.get('email')
         
-        # Check if user exists
-        user = User.query.filter_by(google_id=google_id).first()
-        
-        if not user:
-            # Create new user
-            user = User(
-                google_id=google_id,
-                email=email,
-                name=user_info.get('name', ''),
-                picture=user_info.get('picture', ''),
-                google_token=json.dumps(token),
-                created_at=datetime.utcnow(),
-                last_login=datetime.utcnow()
-            )
-            db.session.add(user)
-            db.session.commit()
+        # Upsert in one statement: no SELECT-then-INSERT round trip and no
+        # race between concurrent callbacks for the same Google account.
+        # created_at only equals :now on the fresh-insert path.  The raw
+        # INSERT bypasses the ORM's Python-side column defaults, so the
+        # defaulted settings columns are listed explicitly; DO UPDATE
+        # leaves them untouched for existing rows.
+        now = datetime.utcnow()
+        token_json = orjson.dumps(token).decode()
+        row = db.session.execute(text(
+            'INSERT INTO users (google_id, email, name, picture, google_token, '
+            'base_currency, trading_costs_enabled, balanced_threshold, '
+            'precision_rebalancing, created_at, last_login) '
+            'VALUES (:g, :e, :n, :p, :t, :base, :costs, :threshold, :precision, :now, :now) '
+            'ON CONFLICT(google_id) DO UPDATE SET '
+            'last_login = excluded.last_login, google_token = excluded.google_token '
+            'RETURNING id, name, (created_at = :now) AS is_new'
+        ), {
+            'g': google_id,
+            'e': email,
+            'n': user_info.get('name', ''),
+            'p': user_info.get('picture', ''),
+            't': token_json,
+            'base': 'CAD',
+            'costs': False,
+            'threshold': 0.5,
+            'precision': True,
+            'now': now,
+        }).mappings().first()
+        db.session.commit()
+
+        user = User.query.get(row['id'])
+        if row['is_new']:
             flash(f'Welcome {user.name}! Your account has been created.', 'success')
         else:
-            # Update last login
-            user.last_login = datetime.utcnow()
-            user.google_token = json.dumps(token)
-            db.session.commit()
             flash(f'Welcome back, {user.name}!', 'success')
-        
+
         # Log user in
         login_user(user, remember=True)
         
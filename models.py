@@ -1,3 +1,7 @@
+from array import array
+
+import orjson
+from flask import g, has_request_context
 from flask_login import UserMixin
 from datetime import datetime
 from extensions import db
@@ -12,8 +16,8 @@ class User(UserMixin, db.Model):
     name = db.Column(db.String(255))
     picture = db.Column(db.String(512))
     base_currency = db.Column(db.String(3), default='CAD')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_login = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp())
+    last_login = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp(), onupdate=datetime.utcnow)
     trading_costs_enabled = db.Column(db.Boolean, default=False)
     balanced_threshold = db.Column(db.Float, default=0.5)
     precision_rebalancing = db.Column(db.Boolean, default=True)
@@ -26,7 +30,9 @@ class User(UserMixin, db.Model):
  
     # Relationships
     targets = db.relationship('Target', back_populates='user', lazy=True, cascade='all, delete-orphan')
-    accounts = db.relationship('Account', back_populates='user', lazy=True, cascade='all, delete-orphan')
+    # selectin: the rebalancer iterates user.accounts repeatedly, so load
+    # the collection in one batched IN query instead of lazily.
+    accounts = db.relationship('Account', back_populates='user', lazy='selectin', cascade='all, delete-orphan')
     security_preferences = db.relationship('SecurityPreference', back_populates='user', lazy=True, cascade='all, delete-orphan') 
     
     def __repr__(self):
@@ -45,13 +51,15 @@ class Account(db.Model):
     is_registered = db.Column(db.Boolean, default=False)  # Tax status
     priority = db.Column(db.Integer, default=0)  # For rebalancing order
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp(), onupdate=datetime.utcnow)
     cash_balance = db.Column(db.Float, default=0.0)  # In account's currency
     
     # Relationships
-    holdings = db.relationship('Holding', back_populates='account', lazy=True, cascade='all, delete-orphan')
-    user = db.relationship('User', back_populates='accounts')
+    holdings = db.relationship('Holding', back_populates='account', lazy='selectin', cascade='all, delete-orphan')
+    # joined: every valuation reads account.user.base_currency, so fold
+    # the (single) parent row into the account query.
+    user = db.relationship('User', back_populates='accounts', lazy='joined')
     
     def total_value_in_base_currency(self, exchange_rates):
         '''Calculate total account value in base currency'''
@@ -60,7 +68,23 @@ class Account(db.Model):
             total += holding.market_value_in_base_currency(exchange_rates)
         return total
 
-    
+    def cached_total_value(self, exchange_rates):
+        '''total_value_in_base_currency memoized in flask.g for the request.
+
+        Allocation, drift and the templates all re-total the same accounts
+        within one request; the memo lives in g so it can never outlive
+        the request or leak between users. Falls back to a direct compute
+        outside a request context (background jobs).
+        '''
+        if not has_request_context():
+            return self.total_value_in_base_currency(exchange_rates)
+        cache = g.setdefault('_account_totals', {})
+        key = (self.id, id(exchange_rates))
+        if key not in cache:
+            cache[key] = self.total_value_in_base_currency(exchange_rates)
+        return cache[key]
+
+
     def __repr__(self):
         return f'<Account {self.name}>'
 
@@ -68,7 +92,13 @@ class Account(db.Model):
 class Holding(db.Model):
     '''Individual security holding'''
     __tablename__ = 'holdings'
-    
+
+    # Covers the aggregation joins that group holdings by account and
+    # look up the security in the same scan
+    __table_args__ = (
+        db.Index('ix_holdings_account_security', 'account_id', 'security_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=False, index=True)
 
@@ -78,11 +108,13 @@ class Holding(db.Model):
     quantity = db.Column(db.Float, nullable=False)
     price = db.Column(db.Float, nullable=False)
     notes = db.Column(db.Text)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp(), onupdate=datetime.utcnow)
 
     # Relationships
     account = db.relationship("Account", back_populates="holdings")
-    security = db.relationship("Security", back_populates="holdings")
+    # selectin: ticker/currency/asset_class_id all delegate to the
+    # security, so batch the lookups by PK rather than one per holding.
+    security = db.relationship("Security", back_populates="holdings", lazy='selectin')
     
     @property
     def market_value(self):
@@ -90,12 +122,25 @@ class Holding(db.Model):
         return self.quantity * self.price
     
     def market_value_in_base_currency(self, exchange_rates):
+        # Allocation, drift and planning code all value the same holding
+        # repeatedly against the same rates dict, so memoize per rates-dict
+        # identity. Quantity/price edits go through fresh requests with a
+        # fresh rates dict, so entries never go stale within their key.
+        cache = self.__dict__.setdefault('_mv_cache', {})
+        key = id(exchange_rates)
+        if key in cache:
+            return cache[key]
         value = self.market_value
         sec_currency = self.security.currency  # single source of truth
         base_currency = self.account.user.base_currency
         if sec_currency != base_currency:
-            rate = exchange_rates.get(f"{sec_currency}_TO_{base_currency}", 1.0)
+            # Tuple key first (no f-string build); string key kept for
+            # rates dicts assembled by older callers.
+            rate = exchange_rates.get((sec_currency, base_currency))
+            if rate is None:
+                rate = exchange_rates.get(f"{sec_currency}_TO_{base_currency}", 1.0)
             value *= rate
+        cache[key] = value
         return value
 
     @property
@@ -126,8 +171,8 @@ class Target(db.Model):
     
     user = db.relationship('User', back_populates='targets')
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp(), onupdate=datetime.utcnow)
     
     def __repr__(self):
         return f'<Target {self.asset_class}: {self.target_percentage}%>'
@@ -136,12 +181,17 @@ class Target(db.Model):
 class ExchangeRate(db.Model):
     '''Store exchange rates for currency conversion'''
     __tablename__ = 'exchange_rates'
-    
+
+    # Covers the cache lookup: filter by pair, newest first
+    __table_args__ = (
+        db.Index('ix_exchange_rates_pair_date', 'from_currency', 'to_currency', 'date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     from_currency = db.Column(db.String(3), nullable=False, index=True)
     to_currency = db.Column(db.String(3), nullable=False, index=True)
     rate = db.Column(db.Float, nullable=False)
-    date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    date = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp(), index=True)
     source = db.Column(db.String(50))  # 'manual', 'api', 'yfinance'
     
     def __repr__(self):
@@ -150,7 +200,14 @@ class ExchangeRate(db.Model):
 class RebalanceTransaction(db.Model):
     '''Recommended transactions for rebalancing'''
     __tablename__ = 'rebalance_transactions'
-    
+
+    # Covers the pending-trades view: filter by user + executed, sorted
+    # by execution_order, straight off the index
+    __table_args__ = (
+        db.Index('ix_rebalance_txns_user_pending',
+                 'user_id', 'executed', 'execution_order'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=False)
@@ -164,12 +221,35 @@ class RebalanceTransaction(db.Model):
     
     is_final_trade = db.Column(db.Boolean, default=False)  # Use fractional shares to zero cash
     requires_user_selection = db.Column(db.Boolean, default=False)  # Multiple securities available
-    available_securities = db.Column(db.JSON, nullable=True)  # List of security IDs if user needs to choose
+    # List of security IDs if user needs to choose, packed as uint32s
+    # (4 bytes per ID, no JSON parse on read); see the property below
+    _available_securities = db.Column('available_securities', db.LargeBinary, nullable=True)
+
+    @property
+    def available_securities(self):
+        raw = self._available_securities
+        if not raw:
+            return None
+        if isinstance(raw, str):
+            # Legacy rows written while the column was JSON text come
+            # back as str on SQLite; packed blobs are always bytes, so
+            # no content sniffing (a packed id like 91 starts with the
+            # same byte as '[').
+            return orjson.loads(raw)
+        ids = array('I')
+        ids.frombytes(raw)
+        return list(ids)
+
+    @available_securities.setter
+    def available_securities(self, ids):
+        self._available_securities = (
+            array('I', ids).tobytes() if ids is not None else None
+        )
     
     execution_order = db.Column(db.Integer)  # Sequence number
     executed = db.Column(db.Boolean, default=False)
     executed_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.current_timestamp())
     
     account = db.relationship('Account')
     user = db.relationship('User')
@@ -197,7 +277,8 @@ class Security(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     ticker = db.Column(db.String(20), unique=True, nullable=False)       # e.g. VTI, MUB
     name = db.Column(db.String(120))
-    asset_class_id = db.Column(db.Integer, db.ForeignKey('asset_classes.id'), nullable=False)
+    # Indexed: the rebalancer groups/filters securities by asset class
+    asset_class_id = db.Column(db.Integer, db.ForeignKey('asset_classes.id'), nullable=False, index=True)
 
     currency = db.Column(db.String(3), default='CAD')
     is_public = db.Column(db.Boolean, default=True)
@@ -6,6 +6,8 @@ import copy
 import logging
 from collections import defaultdict
 
+from sqlalchemy import select
+
 from models import (
     Account, Holding, Security, SecurityPreference,
     RebalanceTransaction, Target,
@@ -28,21 +30,29 @@ class TransactionPlan:
         new_positions = 0
         registered_sells = 0
         unregistered_sells = 0
-        accounts_cache: dict = {}
 
-        # Build a portfolio-wide set of existing security IDs
-        all_held_security_ids = set()
-        for acc in Account.query.filter_by(user_id=user.id).all():
-            for h in acc.holdings:
-                all_held_security_ids.add(h.security_id)
+        # score() only needs two scalars per row, so read them with Core
+        # selects instead of hydrating Account/Holding instances — this
+        # runs once per candidate plan.
+        all_held_security_ids = {
+            row[0] for row in db.session.execute(
+                select(Holding.security_id)
+                .join(Account, Holding.account_id == Account.id)
+                .where(Account.user_id == user.id)
+                .distinct()
+            )
+        }
+        registered_by_id = dict(db.session.execute(
+            select(Account.id, Account.is_registered)
+            .where(Account.user_id == user.id)
+        ).all())
 
         for txn in self.transactions:
-            acc = accounts_cache.setdefault(txn.account_id, Account.query.get(txn.account_id))
             if txn.action == "BUY" and txn.security_id:
                 if txn.security_id not in all_held_security_ids:
                     new_positions += 1
-            elif txn.action == "SELL" and acc:
-                if acc.is_registered:
+            elif txn.action == "SELL" and txn.account_id in registered_by_id:
+                if registered_by_id[txn.account_id]:
                     registered_sells += 1
                 else:
                     unregistered_sells += 1
@@ -77,32 +87,92 @@ class RebalancingStrategy:
         return len(all_securities) * 10 + eligible_account_count
 
 
+    def _reset_plan_cache(self, user):
+        """
+        Build the per-plan lookup tables once instead of re-querying and
+        re-parsing preferences on every _eligible_securities call.
+
+        Preference account lists are parsed into frozensets / dicts up
+        front so eligibility checks are O(1) set probes, and computed
+        eligibility is memoized per (asset_class_id, account_id) — safe
+        because holdings/preferences don't change while planning.
+        """
+        prefs = {}
+        for p in SecurityPreference.query.filter_by(user_id=user.id).all():
+            cfg = p.account_config or {}
+            priority_by_account = {}
+            for level in (1, 2, 3):
+                for acct_id in cfg.get(f"priority_{level}", []):
+                    priority_by_account.setdefault(acct_id, level)
+            prefs[p.security_id] = {
+                "restriction_type": p.restriction_type,
+                "allowed": frozenset(cfg.get("allowed", [])),
+                "priority_by_account": priority_by_account,
+            }
+        secs_by_class = defaultdict(list)
+        secs_by_id = {}
+        sec_class_by_id = {}
+        for sec in Security.query.all():
+            secs_by_class[sec.asset_class_id].append(sec)
+            secs_by_id[sec.id] = sec
+            sec_class_by_id[sec.id] = sec.asset_class_id
+        self._plan_cache = {
+            "prefs": prefs,
+            "secs_by_class": secs_by_class,
+            "secs_by_id": secs_by_id,
+            "sec_class_by_id": sec_class_by_id,
+            "eligible": {},
+        }
+
     def _eligible_securities(self, asset_class_id, account, user):
-        securities = Security.query.filter_by(asset_class_id=asset_class_id).all()
-        prefs = {p.security_id: p for p in SecurityPreference.query.filter_by(user_id=user.id).all()}
+        cache = getattr(self, "_plan_cache", None)
+        if cache is None:
+            self._reset_plan_cache(user)
+            cache = self._plan_cache
+        key = (asset_class_id, account.id)
+        if key in cache["eligible"]:
+            return cache["eligible"][key]
+
+        held_ids = {h.security_id for h in account.holdings}
         result = []
-        for sec in securities:
-            pref = prefs.get(sec.id)
+        for sec in cache["secs_by_class"].get(asset_class_id, []):
+            pref = cache["prefs"].get(sec.id)
             allowed = True
             priority = 99  # unlisted = lowest priority
 
-            if pref and pref.restriction_type == "restricted_to_accounts":
-                allowed_ids = (pref.account_config or {}).get("allowed", [])
-                allowed = account.id in allowed_ids
-
-            elif pref and pref.restriction_type == "prioritized_accounts":
-                cfg = pref.account_config or {}
-                for level in (1, 2, 3):
-                    if account.id in cfg.get(f"priority_{level}", []):
-                        priority = level
-                        break
+            if pref and pref["restriction_type"] == "restricted_to_accounts":
+                allowed = account.id in pref["allowed"]
+            elif pref and pref["restriction_type"] == "prioritized_accounts":
                 # accounts not listed remain allowed but at priority 99
+                priority = pref["priority_by_account"].get(account.id, 99)
 
             if allowed:
-                existing = any(h.security_id == sec.id for h in account.holdings)
-                result.append({"security": sec, "existing": existing, "priority": priority})
+                result.append({"security": sec, "existing": sec.id in held_ids, "priority": priority})
+        cache["eligible"][key] = result
         return result
 
+    def _security_class(self, security_id, user):
+        """Asset class of *security_id* from the plan cache, without the
+        per-call Security.query.get round trip (None if unknown)."""
+        cache = getattr(self, "_plan_cache", None)
+        if cache is None:
+            self._reset_plan_cache(user)
+            cache = self._plan_cache
+        return cache["sec_class_by_id"].get(security_id)
+
+    def _class_has_priority_pref(self, user, asset_class_id) -> bool:
+        """True if any security in this asset class carries an explicit
+        prioritized_accounts preference for this user."""
+        cache = getattr(self, "_plan_cache", None)
+        if cache is None:
+            self._reset_plan_cache(user)
+            cache = self._plan_cache
+        return any(
+            pref["restriction_type"] == "prioritized_accounts"
+            and cache["sec_class_by_id"].get(sec_id) == asset_class_id
+            for sec_id, pref in cache["prefs"].items()
+        )
+
 
     def _create_sell_transaction(self, user, account, holding, sell_value, execution_order):
         quantity = int(sell_value / holding.price)
@@ -249,11 +319,11 @@ class RebalancingStrategy:
         for txn in transactions:
             if not txn.security_id:
                 continue
-            sec = Security.query.get(txn.security_id)
-            if not sec or sec.asset_class_id not in delta_map:
+            txn_class = self._security_class(txn.security_id, user)
+            if txn_class is None or txn_class not in delta_map:
                 continue
             amount_base = self._to_base(txn.amount, txn.currency, user, exchange_rates)
-            d = delta_map[sec.asset_class_id]
+            d = delta_map[txn_class]
             if txn.action == "BUY":
                 d["current_value"] += amount_base
                 d["dollar_diff"]   -= amount_base
@@ -304,12 +374,7 @@ class RebalancingStrategy:
                     if my_priority > best_possible_priority:
                         log.info("PRIORITY_SKIP precision_tune account=%s ac_id=%s", account.name, ac_id)
                         continue
-                has_explicit_priority_pref = any(
-                    p.restriction_type == "prioritized_accounts"
-                    for p in SecurityPreference.query.filter_by(user_id=user.id).all()
-                    if Security.query.get(p.security_id) is not None
-                    and Security.query.get(p.security_id).asset_class_id == ac_id
-                )
+                has_explicit_priority_pref = self._class_has_priority_pref(user, ac_id)
                 if has_explicit_priority_pref:
                     if my_priority >= 99:
                         log.info("PRIORITY_SKIP precision_tune (explicit pref) account=%s ac_id=%s", account.name, ac_id)
@@ -400,12 +465,7 @@ class RebalancingStrategy:
                         log.info("PRIORITY_SKIP account=%s ac_id=%s", account.name, ac_id)
                         continue
 
-                has_explicit_priority_pref = any(
-                    p.restriction_type == "prioritized_accounts"
-                    for p in SecurityPreference.query.filter_by(user_id=user.id).all()
-                    if Security.query.get(p.security_id) is not None
-                    and Security.query.get(p.security_id).asset_class_id == ac_id
-                )
+                has_explicit_priority_pref = self._class_has_priority_pref(user, ac_id)
                 if has_explicit_priority_pref:
                     if my_priority >= 99:
                         continue
@@ -435,8 +495,7 @@ class RebalancingStrategy:
                     if t.action == "BUY"
                     and t.account_id == account.id
                     and t.security_id is not None
-                    and Security.query.get(t.security_id) is not None
-                    and Security.query.get(t.security_id).asset_class_id == ac_id),
+                    and self._security_class(t.security_id, user) == ac_id),
                     None
                 )
                 if existing_buy and existing_buy.price and existing_buy.price > 0:
@@ -644,6 +703,7 @@ class RebalancingStrategy:
     def _assemble_plan(self, user, deltas, overweight, underweight, account_cash,
                        exchange_rates, accounts_sorted, require_existing,
                        cash_phase_accounts=None):
+        self._reset_plan_cache(user)
         transactions    = []
         execution_order = 1
         remaining_to_buy  = {ac_id: abs(amt) for ac_id, _, amt, _ in underweight}
@@ -789,6 +849,7 @@ class HeuristicStrategy(RebalancingStrategy):
         return score
 
     def generate(self, user, deltas, overweight, underweight, account_cash, exchange_rates):
+        self._reset_plan_cache(user)
         transactions    = []
         execution_order = 1
         remaining_to_buy  = {ac_id: abs(amt) for ac_id, _, amt, _ in underweight}
@@ -859,12 +920,7 @@ class HeuristicStrategy(RebalancingStrategy):
                         for h in account.holdings
                     )
 
-                    has_explicit_priority_pref = any(
-                        p.restriction_type == "prioritized_accounts"
-                        for p in SecurityPreference.query.filter_by(user_id=user.id).all()
-                        if Security.query.get(p.security_id) is not None
-                        and Security.query.get(p.security_id).asset_class_id == ac_id
-                    )
+                    has_explicit_priority_pref = self._class_has_priority_pref(user, ac_id)
                     if has_explicit_priority_pref:
                         if my_priority >= 99:
                             continue
@@ -902,8 +958,7 @@ class HeuristicStrategy(RebalancingStrategy):
                     (t for t in transactions
                      if t.action == "BUY" and t.account_id == account.id
                      and t.security_id is not None
-                     and Security.query.get(t.security_id) is not None
-                     and Security.query.get(t.security_id).asset_class_id == ac_id),
+                     and self._security_class(t.security_id, user) == ac_id),
                     None
                 )
                 if existing_buy and existing_buy.price and existing_buy.price > 0:
@@ -963,12 +1018,16 @@ class HeuristicStrategy(RebalancingStrategy):
 # Engine entry-point
 # ============================================================================
 
-_STRATEGIES = [
-    CashFirstStrategy(),
-    MinimizePositionsStrategy(),
-    CashEfficientStrategy(),
-    TaxOptimizedStrategy(),
-    HeuristicStrategy(),
+# Strategies carry per-plan cache state (_plan_cache), so they are
+# instantiated fresh for every run instead of being shared singletons —
+# gunicorn serves with --threads 4, and two concurrent generations must
+# not see each other's preference tables.
+_STRATEGY_CLASSES = [
+    CashFirstStrategy,
+    MinimizePositionsStrategy,
+    CashEfficientStrategy,
+    TaxOptimizedStrategy,
+    HeuristicStrategy,
 ]
 
 
@@ -1009,7 +1068,8 @@ def generate_rebalance_transactions(user) -> list:
     best_plan = None
     best_residual = None
 
-    for strategy in _STRATEGIES:
+    for strategy_cls in _STRATEGY_CLASSES:
+        strategy = strategy_cls()
         try:
             plan = strategy.generate(
                 user, deltas, overweight, underweight,
@@ -1032,8 +1092,26 @@ def generate_rebalance_transactions(user) -> list:
         raise RuntimeError("All rebalancing strategies failed.")
 
     RebalanceTransaction.query.filter_by(user_id=user.id, executed=False).delete()
-    for txn in best_plan.transactions:
-        db.session.add(txn)
+    # Core bulk insert: one executemany + one commit instead of per-row
+    # ORM flush bookkeeping. The transient plan objects stay detached —
+    # callers only count them; the view re-queries the rows it renders.
+    rows = [{
+        'user_id': t.user_id,
+        'account_id': t.account_id,
+        'security_id': t.security_id,
+        'action': t.action,
+        'quantity': t.quantity,
+        'price': t.price,
+        'amount': t.amount,
+        'currency': t.currency,
+        'is_final_trade': bool(t.is_final_trade),
+        'requires_user_selection': bool(t.requires_user_selection),
+        'available_securities': t._available_securities,
+        'execution_order': t.execution_order,
+        'executed': False,
+    } for t in best_plan.transactions]
+    if rows:
+        db.session.execute(RebalanceTransaction.__table__.insert(), rows)
     db.session.commit()
 
     log.info(
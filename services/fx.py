@@ -6,8 +6,12 @@ base_currency (default: CAD).  This module is the single source of truth
 for FX logic.
 """
 import logging
+import time
+import orjson
 import requests
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from extensions import db
 from models import ExchangeRate
 
@@ -16,12 +20,63 @@ log = logging.getLogger(__name__)
 _CACHE_TTL_SECONDS = 14_400   # 4 hours
 _FALLBACK_USD_CAD  = 1.35
 
+# One shared session so repeated rate fetches reuse the TCP/TLS connection
+# instead of paying a full handshake per call.  Retries with backoff
+# absorb transient 429/5xx responses from the rate API.
+_adapter = HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.5,
+                      status_forcelist=[429, 500, 502, 503, 504]),
+)
+_session = requests.Session()
+_session.mount('https://', _adapter)
+_session.mount('http://', _adapter)
+
+
+_SUPPORTED_CURRENCIES = {"CAD", "USD"}  # expand as needed
+
+# In-process tier in front of the DB rate cache: rates move at most a few
+# times a day, so there is no point re-running the pair SELECT on every
+# request.  {(from, to): (expires_at, rate)} — a handful of entries, so
+# no eviction needed.
+_MEMO_TTL_SECONDS = 300
+_rate_memo: dict = {}
+
+
+def _memo_put(from_curr: str, to_curr: str, rate: float):
+    _rate_memo[(from_curr, to_curr)] = (time.time() + _MEMO_TTL_SECONDS, rate)
+
+
+def invalidate_rate_memo():
+    """Drop the in-process memo so the next lookup re-reads the DB.
+
+    Called after manual rate entry, which must take effect immediately
+    rather than after the TTL lapses.
+    """
+    _rate_memo.clear()
+
+
+def _fetch_rates_for_base(from_curr: str) -> dict:
+    """One API call returns every rate for *from_curr* as the base."""
+    resp = _session.get(
+        f"https://api.exchangerate-api.com/v4/latest/{from_curr}", timeout=10
+    )
+    resp.raise_for_status()
+    # orjson parses the raw bytes directly; resp.json() would first decode
+    # to str and then run the slower stdlib parser.
+    return orjson.loads(resp.content)["rates"]
+
 
 def fetch_exchange_rate(from_curr: str, to_curr: str) -> float:
     """Return exchange rate from_curr → to_curr, using DB cache then live API."""
     if from_curr == to_curr:
         return 1.0
 
+    memo = _rate_memo.get((from_curr, to_curr))
+    if memo and memo[0] > time.time():
+        return memo[1]
+
     cached = (
         ExchangeRate.query
         .filter_by(from_currency=from_curr, to_currency=to_curr)
@@ -29,27 +84,31 @@ def fetch_exchange_rate(from_curr: str, to_curr: str) -> float:
         .first()
     )
     if cached and (datetime.utcnow() - cached.date).total_seconds() < _CACHE_TTL_SECONDS:
+        _memo_put(from_curr, to_curr, cached.rate)
         return cached.rate
 
     try:
-        resp = requests.get(
-            f"https://api.exchangerate-api.com/v4/latest/{from_curr}", timeout=10
-        )
-        resp.raise_for_status()
-        rate = float(resp.json()["rates"][to_curr])
-        # Replace stale cache entry
-        ExchangeRate.query.filter_by(
-            from_currency=from_curr, to_currency=to_curr
-        ).delete()
-        db.session.add(ExchangeRate(
-            from_currency=from_curr,
-            to_currency=to_curr,
-            rate=rate,
-            source="exchangerate-api",
-            date=datetime.utcnow(),
-        ))
+        # The API returns the whole rate table for a base in one response,
+        # so cache every supported cross-rate from it — refreshing N pairs
+        # costs one HTTP round-trip per base instead of one per pair.
+        rates = _fetch_rates_for_base(from_curr)
+        now = datetime.utcnow()
+        for to in _SUPPORTED_CURRENCIES:
+            if to == from_curr or to not in rates:
+                continue
+            ExchangeRate.query.filter_by(
+                from_currency=from_curr, to_currency=to
+            ).delete()
+            db.session.add(ExchangeRate(
+                from_currency=from_curr,
+                to_currency=to,
+                rate=float(rates[to]),
+                source="exchangerate-api",
+                date=now,
+            ))
+            _memo_put(from_curr, to, float(rates[to]))
         db.session.commit()
-        return rate
+        return float(rates[to_curr])
     except Exception as exc:
         log.warning("FX fetch failed (%s→%s): %s", from_curr, to_curr, exc)
         if cached:
@@ -60,18 +119,22 @@ def fetch_exchange_rate(from_curr: str, to_curr: str) -> float:
 def get_exchange_rates(user) -> dict:
     """
     Return a dict of all cross-rates needed for the user's portfolio.
-    Keys follow the pattern  "{FROM}_TO_{TO}"  e.g. "USD_TO_CAD".
+
+    Each rate is stored under two keys: a ("FROM", "TO") tuple for hot
+    lookups (no per-call string formatting) and the legacy "{FROM}_TO_{TO}"
+    string for templates and older callers.
     """
     rates: dict = {}
-    currencies = {"CAD", "USD"}  # expand as needed
 
-    for frm in currencies:
-        for to in currencies:
+    for frm in _SUPPORTED_CURRENCIES:
+        for to in _SUPPORTED_CURRENCIES:
             if frm == to:
                 continue
             key = f"{frm}_TO_{to}"
             try:
-                rates[key] = fetch_exchange_rate(frm, to)
+                rate = fetch_exchange_rate(frm, to)
+                rates[key] = rate
+                rates[(frm, to)] = rate
             except Exception as exc:
                 log.error("Could not obtain rate %s: %s", key, exc)
     return rates
@@ -82,6 +145,13 @@ def convert_to_base(amount: float, from_currency: str, to_currency: str,
     """Convert *amount* from_currency → to_currency using exchange_rates dict."""
     if from_currency == to_currency:
         return amount
+    # Tuple keys first: the fast path avoids building an f-string per call.
+    rate = exchange_rates.get((from_currency, to_currency))
+    if rate is not None:
+        return amount * rate
+    inverse_rate = exchange_rates.get((to_currency, from_currency))
+    if inverse_rate is not None:
+        return amount / inverse_rate
     key = f"{from_currency}_TO_{to_currency}"
     if key in exchange_rates:
         return amount * exchange_rates[key]
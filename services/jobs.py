@@ -0,0 +1,178 @@
+"""
+services/jobs.py – Background refresh jobs for prices and exchange rates.
+
+Price and FX refreshes hit external APIs and can take tens of seconds, so
+they must not run on the request thread.  A BackgroundScheduler refreshes
+everything on a fixed interval, and the POST handlers enqueue a one-off
+refresh via a small thread pool and return immediately; clients poll
+/api/portfolio/summary for the updated values.
+"""
+import fcntl
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from extensions import db
+
+log = logging.getLogger(__name__)
+
+_REFRESH_INTERVAL_MINUTES = 15
+
+_app = None
+_scheduler = None
+_scheduler_lock_fh = None
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='refresh')
+
+
+def _acquire_scheduler_lock() -> bool:
+    """Take a non-blocking flock so only one process runs the scheduler.
+
+    Gunicorn forks multiple workers from the same image; without this,
+    each would run the interval jobs (duplicate API calls and racing
+    delete+inserts on exchange_rates).  The file handle is kept open for
+    the process lifetime so the lock dies with it.
+    """
+    global _scheduler_lock_fh
+    lock_path = os.path.join(
+        os.getenv('SCHEDULER_LOCK_DIR', '/tmp'), 'portfolio-scheduler.lock'
+    )
+    try:
+        fh = open(lock_path, 'w')
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    _scheduler_lock_fh = fh
+    return True
+
+
+def init_app(app):
+    """Attach the Flask app and start the interval scheduler.
+
+    One-shot processes (flask init-db in the container CMD) set
+    RUN_SCHEDULER=0 to skip it entirely; among the serving workers, a
+    file lock elects a single scheduler instance.  The one-off refresh
+    executor stays available in every process.
+    """
+    global _app, _scheduler
+    _app = app
+    if _scheduler is not None:
+        return
+    if os.getenv('RUN_SCHEDULER', '1') != '1':
+        log.info('Background scheduler disabled (RUN_SCHEDULER=0).')
+        return
+    if not _acquire_scheduler_lock():
+        log.info('Background scheduler already running in another worker.')
+        return
+    _scheduler = BackgroundScheduler(daemon=True)
+    _scheduler.add_job(refresh_all_prices, 'interval',
+                       minutes=_REFRESH_INTERVAL_MINUTES)
+    _scheduler.add_job(refresh_exchange_rates, 'interval',
+                       minutes=_REFRESH_INTERVAL_MINUTES)
+    _scheduler.start()
+    log.info('Background refresh scheduler started (every %d min).',
+             _REFRESH_INTERVAL_MINUTES)
+
+
+def submit_price_refresh(user_id: int):
+    """Queue a one-off price refresh for *user_id* without blocking."""
+    _executor.submit(refresh_prices_for_user, user_id)
+
+
+def submit_fx_refresh():
+    """Queue a one-off exchange-rate refresh without blocking."""
+    _executor.submit(refresh_exchange_rates)
+
+
+def refresh_prices_for_user(user_id: int) -> int:
+    """Pull sheet prices for one user and update their holdings.
+
+    Returns the number of holdings updated.  Safe to call from worker
+    threads; opens its own app context.
+    """
+    from models import User, Account, Holding, Security
+    from services.prices import get_sheet_prices
+
+    with _app.app_context():
+        user = User.query.get(user_id)
+        if user is None:
+            return 0
+        try:
+            prices = get_sheet_prices(user)
+            if not prices:
+                log.info('No prices fetched for user %s.', user_id)
+                return 0
+            holdings = (
+                Holding.query
+                .join(Account)
+                .join(Security)
+                .filter(
+                    Account.user_id == user_id,
+                    Security.is_public == True,
+                    Security.auto_update_price == True,
+                )
+                .all()
+            )
+            updated = 0
+            for h in holdings:
+                price = prices.get(h.security.ticker)
+                if price is not None:
+                    h.price = float(price)
+                    h.updated_at = datetime.utcnow()
+                    updated += 1
+            db.session.commit()
+            log.info('Refreshed %d prices for user %s.', updated, user_id)
+            return updated
+        except Exception:
+            db.session.rollback()
+            log.exception('Price refresh failed for user %s', user_id)
+            return 0
+
+
+def refresh_all_prices():
+    """Scheduled job: refresh holding prices for every user with a sheet."""
+    from models import User
+
+    with _app.app_context():
+        user_ids = [
+            u.id for u in User.query.all()
+            if u.price_sheet_id and u.google_token
+        ]
+    for uid in user_ids:
+        refresh_prices_for_user(uid)
+
+
+def _refresh_rates_for_base(frm: str, currencies: list) -> int:
+    """Refresh every cross-rate with *frm* as base (own app context)."""
+    from services.fx import fetch_exchange_rate
+
+    with _app.app_context():
+        updated = 0
+        for to in currencies:
+            if frm == to:
+                continue
+            try:
+                if fetch_exchange_rate(frm, to):
+                    updated += 1
+            except Exception as exc:
+                log.warning('FX refresh failed (%s→%s): %s', frm, to, exc)
+        return updated
+
+
+def refresh_exchange_rates() -> int:
+    """Scheduled job: refresh all cross-rates used by the app.
+
+    The per-base fetches are independent network calls, so they run in
+    parallel (each base is one API round-trip; see services/fx.py).
+    """
+    currencies = ['CAD', 'USD']
+    with ThreadPoolExecutor(max_workers=len(currencies)) as ex:
+        updated = sum(
+            f.result()
+            for f in [ex.submit(_refresh_rates_for_base, frm, currencies)
+                      for frm in currencies]
+        )
+    log.info('Refreshed %d exchange rates.', updated)
+    return updated
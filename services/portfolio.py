@@ -4,10 +4,59 @@ services/portfolio.py – Portfolio-level analytics helpers.
 All returned values are in the user's base_currency unless noted.
 """
 from collections import defaultdict
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from extensions import db
 from models import Account, Target, AssetClass, Security, SecurityPreference, Holding
 from services.fx import convert_to_base
 
 
+def load_accounts(user):
+    """Fetch the user's accounts with holdings and securities eagerly.
+
+    Walking ``account.holdings[i].security`` through the default-lazy
+    relationships fires one SELECT per holding (the classic N+1); this
+    loads the whole tree in three queries regardless of portfolio size.
+    """
+    return (
+        Account.query
+        .options(selectinload(Account.holdings).joinedload(Holding.security))
+        .filter_by(user_id=user.id)
+        .all()
+    )
+
+
+def account_totals_in_base(user, exchange_rates: dict) -> dict:
+    """
+    Per-account market value in base currency, via one SQL aggregate.
+
+    SUM(quantity * price) grouped by (account, currency) runs as a single
+    C-level scan in the database; only the handful of per-currency
+    subtotals come back to Python for the FX step.  Read-only views
+    (dashboard) use this; editable pages keep the ORM path.
+
+    Returns {account_id: value_in_base}.
+    """
+    base = user.base_currency
+    rows = (
+        db.session.query(
+            Holding.account_id,
+            Security.currency,
+            func.sum(Holding.quantity * Holding.price),
+        )
+        .join(Account, Holding.account_id == Account.id)
+        .join(Security, Holding.security_id == Security.id)
+        .filter(Account.user_id == user.id)
+        .group_by(Holding.account_id, Security.currency)
+        .all()
+    )
+    totals: dict = defaultdict(float)
+    for account_id, currency, value in rows:
+        rate = 1.0 if currency == base else exchange_rates.get((currency, base), 1.0)
+        totals[account_id] += (value or 0.0) * rate
+    return totals
+
+
 def calculate_portfolio_allocation(user, exchange_rates: dict):
     """
     Compute current allocation by asset_class_id.
@@ -20,21 +69,39 @@ def calculate_portfolio_allocation(user, exchange_rates: dict):
     allocation: dict = defaultdict(float)
     total_value = 0.0
 
-    for account in user.accounts:
-        # Cash contribution
-        cash = account.cash_balance or 0.0
-        cash_base = convert_to_base(
-            cash, account.currency, user.base_currency, exchange_rates
+    # Two grouped aggregates instead of a Python loop over every holding:
+    # the multiply-and-sum happens in the database and only per-(class,
+    # currency) subtotals come back for FX conversion.
+    holding_rows = (
+        db.session.query(
+            Security.asset_class_id,
+            Security.currency,
+            func.sum(Holding.quantity * Holding.price),
+        )
+        .join(Account, Holding.account_id == Account.id)
+        .join(Security, Holding.security_id == Security.id)
+        .filter(Account.user_id == user.id,
+                Security.asset_class_id.isnot(None))
+        .group_by(Security.asset_class_id, Security.currency)
+        .all()
+    )
+    for ac_id, currency, value in holding_rows:
+        value_base = convert_to_base(
+            value or 0.0, currency, user.base_currency, exchange_rates
+        )
+        allocation[ac_id] += value_base
+        total_value += value_base
+
+    cash_rows = (
+        db.session.query(Account.currency, func.sum(Account.cash_balance))
+        .filter(Account.user_id == user.id)
+        .group_by(Account.currency)
+        .all()
+    )
+    for currency, cash in cash_rows:
+        total_value += convert_to_base(
+            cash or 0.0, currency, user.base_currency, exchange_rates
         )
-        total_value += cash_base
-
-        # Holdings contribution
-        for holding in account.holdings:
-            if holding.asset_class_id is None:
-                continue
-            value = holding.market_value_in_base_currency(exchange_rates)
-            allocation[holding.asset_class_id] += value
-            total_value += value
 
     allocation_pct = {
         ac_id: (value / total_value * 100 if total_value > 0 else 0.0)
@@ -43,10 +110,14 @@ def calculate_portfolio_allocation(user, exchange_rates: dict):
     return dict(allocation), allocation_pct, total_value
 
 
-def calculate_asset_class_deltas(user, exchange_rates: dict):
+def calculate_asset_class_deltas(user, exchange_rates: dict, allocation_data=None):
     """
     For each target, compute how far current allocation is from target.
 
+    Pass *allocation_data* (the calculate_portfolio_allocation result
+    tuple) when the caller already computed it, to avoid walking every
+    holding a second time.
+
     Returns:
         deltas          – list of dicts with keys:
                           asset_class_id, asset_class_name, target,
@@ -54,9 +125,9 @@ def calculate_asset_class_deltas(user, exchange_rates: dict):
                           percentage_diff, current_pct, target_pct
         total_portfolio – float
     """
-    allocation, allocation_pct, total_portfolio = calculate_portfolio_allocation(
-        user, exchange_rates
-    )
+    if allocation_data is None:
+        allocation_data = calculate_portfolio_allocation(user, exchange_rates)
+    allocation, allocation_pct, total_portfolio = allocation_data
     deltas = []
     for target in Target.query.filter_by(user_id=user.id).all():
         current_value = allocation.get(target.asset_class_id, 0.0)
@@ -86,9 +157,13 @@ def calculate_security_deltas(user, exchange_rates: dict):
         desired_security_delta   – {security_id: delta_in_base}
     """
     security_totals: dict = {}
-    current_by_class: dict = defaultdict(float)
 
-    for account in user.accounts:
+    # One allocation pass serves both the per-class totals here and the
+    # delta computation below.
+    allocation_data = calculate_portfolio_allocation(user, exchange_rates)
+    current_by_class = allocation_data[0]
+
+    for account in load_accounts(user):
         for holding in account.holdings:
             sec = holding.security
             if not sec or not sec.asset_class_id:
@@ -103,9 +178,8 @@ def calculate_security_deltas(user, exchange_rates: dict):
                 }
             security_totals[sec.id]["total_value"]           += value
             security_totals[sec.id]["by_account"][account.id] += value
-            current_by_class[sec.asset_class_id]             += value
 
-    deltas, _ = calculate_asset_class_deltas(user, exchange_rates)
+    deltas, _ = calculate_asset_class_deltas(user, exchange_rates, allocation_data)
     target_by_class = {d["asset_class_id"]: d["target_value"] for d in deltas}
 
     desired_security_delta = {}
@@ -1,14 +1,64 @@
 """
 services/prices.py – External price fetching helpers.
 """
-import json
 import logging
 import os
+import time
+
+import orjson
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 
 log = logging.getLogger(__name__)
 
+_PRICE_CACHE_TTL_SECONDS = 900     # 15 minutes for successful fetches
+_NEGATIVE_TTL_SECONDS    = 60      # retry failed/empty fetches sooner
+_PRICE_CACHE_MAX_ENTRIES = 1024
+_price_cache: dict = {}            # user_id -> (expires_at, {ticker: price})
+
+
+def _evict_price_cache():
+    """Keep the cache bounded: drop expired entries, then oldest if needed."""
+    now = time.time()
+    for uid in [uid for uid, (exp, _) in _price_cache.items() if exp <= now]:
+        del _price_cache[uid]
+    while len(_price_cache) >= _PRICE_CACHE_MAX_ENTRIES:
+        oldest = min(_price_cache, key=lambda uid: _price_cache[uid][0])
+        del _price_cache[oldest]
+
+
+def peek_cached_prices(user) -> dict:
+    """Return the cached prices for *user* without fetching.
+
+    Request handlers that merely want a best-effort price (e.g. the
+    blank-price fallback in add_holding) use this so a cold cache never
+    turns a POST into a multi-second sheet read.  Returns {} on a miss.
+    """
+    cached = _price_cache.get(user.id)
+    if cached and cached[0] > time.time():
+        return cached[1]
+    return {}
+
+
+def get_sheet_prices(user) -> dict:
+    """
+    TTL-cached wrapper around fetch_prices_from_user_sheet.
+
+    The sheet read takes seconds, so repeat callers within the TTL window
+    (rapid UI clicks, multiple forms) share one fetch.  Failed or empty
+    fetches are cached with a much shorter TTL so a transient sheet/auth
+    error doesn't block prices for the full window, while still
+    short-circuiting repeated doomed round-trips.
+    """
+    cached = _price_cache.get(user.id)
+    if cached and cached[0] > time.time():
+        return cached[1]
+    prices = fetch_prices_from_user_sheet(user)
+    ttl = _PRICE_CACHE_TTL_SECONDS if prices else _NEGATIVE_TTL_SECONDS
+    _evict_price_cache()
+    _price_cache[user.id] = (time.time() + ttl, prices)
+    return prices
+
 
 def fetch_prices_from_user_sheet(user) -> dict:
     """
@@ -20,7 +70,7 @@ def fetch_prices_from_user_sheet(user) -> dict:
     if not user.google_token or not user.price_sheet_id:
         return {}
     try:
-        token_dict = json.loads(user.google_token)
+        token_dict = orjson.loads(user.google_token)
         creds = Credentials(
             token=token_dict["access_token"],
             refresh_token=token_dict.get("refresh_token"),